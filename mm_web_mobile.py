@@ -1,43 +1,100 @@
-import os, io, datetime, sqlite3, tempfile
-from collections import defaultdict
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, flash
-from jinja2 import DictLoader
+import os, io, datetime, functools, hashlib, itertools, math, sqlite3, tempfile, threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, Response, render_template, request, redirect, url_for, session, send_file, flash
+from jinja2 import DictLoader, FileSystemBytecodeCache
+
+# reportlab is only needed for PDF export; the rest of the app works without it
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_LEFT
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
 
 # ---------------- Helpers ----------------
 MM_DIGITS = "၀၁၂၃၄၅၆၇၈၉"
 EN_DIGITS = "0123456789"
+# Built once; these helpers run several times per row on every page
+_EN_TO_MM = str.maketrans(EN_DIGITS, MM_DIGITS)
+_MM_TO_EN = str.maketrans(MM_DIGITS, EN_DIGITS, ",")   # also drops thousands separators
 
 def to_myanmar_num(n):
-    return str(n).translate(str.maketrans(EN_DIGITS, MM_DIGITS))
+    return str(n).translate(_EN_TO_MM)
 
 def mmize(s: str) -> str:
     if s is None:
         return ""
-    return str(s).translate(str.maketrans(EN_DIGITS, MM_DIGITS))
+    return str(s).translate(_EN_TO_MM)
 
 def en_number_string(s: str) -> str:
     if s is None:
         return ""
-    s = str(s)
-    trans = str.maketrans(MM_DIGITS + ",", EN_DIGITS + ",")
-    return s.translate(trans).replace(",", "").strip()
+    return str(s).translate(_MM_TO_EN).strip()
 
 def format_amount(n):
+    if isinstance(n, int):
+        return f"{n:,}"
     try:
         return f"{int(round(float(n))):,}"
     except Exception:
         return str(n)
 
 def format_amount_mm(n):
-    return mmize(format_amount(n))
+    return format_amount(n).translate(_EN_TO_MM)
+
+# Largest amount (kyat) kept; a month's SUM()s then stay well inside SQLite's 64-bit integers
+MAX_AMOUNT = 10**15
+
+def parse_amount(s):
+    # Whole kyat (round() half to even); raises for non-numbers, inf/nan and amounts past MAX_AMOUNT
+    val = round(float(s))
+    if abs(val) > MAX_AMOUNT:
+        raise ValueError(s)
+    return val
+
+def _clamp_amount(a):
+    # For old REAL rows, which could hold inf or huge values, or NULL (SQLite stores NaN as NULL); never raises
+    if a is None:
+        return 0
+    a = float(a)
+    if math.isnan(a):
+        return 0
+    return round(max(-MAX_AMOUNT, min(MAX_AMOUNT, a)))
 
 def date_no_zeroes(d: datetime.date) -> str:
     return f"{d.day}-{d.month}-{d.year}"
 
+def next_month(y, m):
+    return (y, m+1) if m < 12 else (y+1, 1)
+
+def _month_bounds(y, m):
+    # [lo, hi) bounds on the stored "YYYY-MM-DD HH:MM" date text for one month
+    ny, nm = next_month(y, m)
+    return f"{y:04d}-{m:02d}-01 00:00", f"{ny:04d}-{nm:02d}-01 00:00"
+
+MM_FONT_NAMES = ("pyidaungsu", "noto sans myanmar", "myanmar text", "myanmar mn", "noto sans myanmar ui")
+# Usual install locations, checked before falling back to walking the font dirs
+MM_FONT_PATHS = (
+    "/usr/share/fonts/truetype/noto/NotoSansMyanmar-Regular.ttf",
+    r"C:\Windows\Fonts\mmrtext.ttf",
+    "/Library/Fonts/Myanmar MN.ttc",
+    "/System/Library/Fonts/Supplemental/Myanmar MN.ttc",
+)
+
+@functools.lru_cache(maxsize=1)
 def find_myanmar_ttf():
-    candidates_names = [
-        "pyidaungsu", "noto sans myanmar", "myanmar text", "myanmar mn", "noto sans myanmar ui"
-    ]
+    # Walking the font dirs is thousands of stat() calls; do it once per process
+    for p in MM_FONT_PATHS:
+        if os.path.isfile(p):
+            return p
+
     search_dirs = []
     if os.name == "nt":
         search_dirs += [r"C:\Windows\Fonts"]
@@ -53,7 +110,7 @@ def find_myanmar_ttf():
                 if ext not in (".ttf", ".otf"):
                     continue
                 low = fn.lower()
-                if any(name in low for name in candidates_names):
+                if any(name in low for name in MM_FONT_NAMES):
                     return os.path.join(root, fn)
     return None
 
@@ -64,16 +121,69 @@ if os.environ.get("VERCEL"):
 else:
     DB_FILE = os.environ.get("DB_FILE", "expense.db")
 
+# Constant SQL text so sqlite3's per-connection statement cache reuses one prepared statement
+_INSERT_EXPENSE_SQL = "INSERT INTO expenses(user_id,date,description,amount,note) VALUES(?,?,?,?,?)"
+_INSERT_INCOME_SQL = "INSERT INTO incomes(user_id,date,description,amount,note) VALUES(?,?,?,?,?)"
+
 class Database:
     def __init__(self, path=DB_FILE):
-        # Ensure parent dir exists (for local custom paths)
-        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-        self.conn = sqlite3.connect(path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self._create_tables()
-
-    def _create_tables(self):
-        cur = self.conn.cursor()
+        # Ensure parent dir exists (for local custom paths); a bare filename needs nothing
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._path = path
+        self._local = threading.local()
+        # Bumped after every committed write; lets callers key caches on the data state
+        self._versions = itertools.count(1)
+        self.version = 0
+        # Schema setup runs once on its own connection, before any request thread can race it
+        boot = self._connect()
+        try:
+            self._create_tables(boot)
+        finally:
+            boot.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._path)
+        conn.row_factory = sqlite3.Row
+        # WAL needs shared-memory support that Vercel's /tmp may lack; the DB there is ephemeral anyway
+        journal_mode = "MEMORY" if os.environ.get("VERCEL") else "WAL"
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")      # ~20 MB page cache
+        conn.execute("PRAGMA mmap_size=134217728")    # 128 MB memory-mapped reads
+        conn.execute("PRAGMA analysis_limit=400")     # keeps the ANALYZE run by PRAGMA optimize cheap
+        return conn
+
+    @property
+    def conn(self):
+        # One connection per thread, so request threads don't serialize on a shared one
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def commit(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.in_transaction:
+            conn.commit()
+            self.version = next(self._versions)
+
+    def optimize(self):
+        # Refresh planner stats for tables this connection's queries used, so SQLite keeps
+        # picking the composite indexes as data grows; a no-op when nothing changed
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not conn.in_transaction:
+            conn.execute("PRAGMA optimize")
+
+    def rollback(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.rollback()
+
+    def _create_tables(self, conn):
+        cur = conn.cursor()
         cur.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -87,7 +197,7 @@ class Database:
                 user_id INTEGER,
                 date TEXT,
                 description TEXT,
-                amount REAL,
+                amount INTEGER,
                 note TEXT DEFAULT ''
             )
         """)
@@ -97,7 +207,7 @@ class Database:
                 user_id INTEGER,
                 date TEXT,
                 description TEXT,
-                amount REAL,
+                amount INTEGER,
                 note TEXT DEFAULT ''
             )
         """)
@@ -111,11 +221,82 @@ class Database:
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        self.conn.commit()
+        self._migrate_integer_amounts(conn)
+        # Running expense total per month, kept current by the triggers below
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='month_totals'")
+        backfill_totals = cur.fetchone() is None
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS month_totals (
+                user_id INTEGER,
+                year INTEGER,
+                month INTEGER,
+                total INTEGER DEFAULT 0,
+                PRIMARY KEY (user_id, year, month)
+            )
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_exp_total_ins AFTER INSERT ON expenses BEGIN
+                INSERT INTO month_totals(user_id,year,month,total)
+                VALUES(NEW.user_id, CAST(substr(NEW.date,1,4) AS INTEGER), CAST(substr(NEW.date,6,2) AS INTEGER), NEW.amount)
+                ON CONFLICT(user_id,year,month) DO UPDATE SET total = total + excluded.total;
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_exp_total_del AFTER DELETE ON expenses BEGIN
+                UPDATE month_totals SET total = total - OLD.amount
+                WHERE user_id=OLD.user_id AND year=CAST(substr(OLD.date,1,4) AS INTEGER)
+                  AND month=CAST(substr(OLD.date,6,2) AS INTEGER);
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_exp_total_upd AFTER UPDATE OF user_id, date, amount ON expenses BEGIN
+                UPDATE month_totals SET total = total - OLD.amount
+                WHERE user_id=OLD.user_id AND year=CAST(substr(OLD.date,1,4) AS INTEGER)
+                  AND month=CAST(substr(OLD.date,6,2) AS INTEGER);
+                INSERT INTO month_totals(user_id,year,month,total)
+                VALUES(NEW.user_id, CAST(substr(NEW.date,1,4) AS INTEGER), CAST(substr(NEW.date,6,2) AS INTEGER), NEW.amount)
+                ON CONFLICT(user_id,year,month) DO UPDATE SET total = total + excluded.total;
+            END
+        """)
+        if backfill_totals:
+            cur.execute("""INSERT INTO month_totals(user_id,year,month,total)
+                           SELECT user_id, CAST(substr(date,1,4) AS INTEGER), CAST(substr(date,6,2) AS INTEGER), SUM(amount)
+                           FROM expenses GROUP BY 1, 2, 3""")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_exp_user_date ON expenses(user_id, date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_inc_user_date ON incomes(user_id, date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_summary_user_ym ON month_summary(user_id, year, month)")
+        conn.commit()
         cur.execute("SELECT COUNT(*) FROM users")
         if cur.fetchone()[0] == 0:
             cur.execute("INSERT INTO users(username,password) VALUES(?,?)", ("admin","1234"))
-            self.conn.commit()
+            conn.commit()
+
+    def _migrate_integer_amounts(self, conn):
+        # Older databases stored amounts as REAL. Kyat amounts are whole numbers,
+        # so round them into an INTEGER column once; month_totals is rebuilt from them.
+        cur = conn.cursor()
+        migrated = False
+        for table in ("expenses", "incomes"):
+            types = {r["name"]: r["type"].upper() for r in cur.execute(f"PRAGMA table_info({table})")}
+            if types.get("amount") != "REAL":
+                continue
+            if not migrated:
+                cur.execute("BEGIN")
+                # DROP COLUMN refuses columns that triggers reference; they are recreated afterwards
+                for trg in ("trg_exp_total_ins", "trg_exp_total_del", "trg_exp_total_upd"):
+                    cur.execute(f"DROP TRIGGER IF EXISTS {trg}")
+                cur.execute("DROP TABLE IF EXISTS month_totals")
+                migrated = True
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN amount_i INTEGER")
+            # Python round() (half to even), as the routes and the old display use; SQL ROUND() rounds half up.
+            # Clamped, so one bad old value can't stop the app from starting.
+            cur.executemany(f"UPDATE {table} SET amount_i=? WHERE id=?",
+                            [(_clamp_amount(a), i)
+                             for i, a in cur.execute(f"SELECT id, amount FROM {table}").fetchall()])
+            cur.execute(f"ALTER TABLE {table} DROP COLUMN amount")
+            cur.execute(f"ALTER TABLE {table} RENAME COLUMN amount_i TO amount")
+        if migrated:
+            conn.commit()
 
     # users
     def create_user(self, username, password):
@@ -134,69 +315,88 @@ class Database:
         row = self.conn.execute("SELECT id FROM users WHERE username=? AND password=?", (username,password)).fetchone()
         return row[0] if row else None
 
-    # expenses
+    # expenses / incomes: writes are committed once per request (see teardown in Flask app)
     def add_expense(self, user_id, date_str, desc, amount, note=""):
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO expenses(user_id,date,description,amount,note) VALUES(?,?,?,?,?)",
-                    (user_id,date_str,desc,amount,note))
-        self.conn.commit()
-        return cur.lastrowid
-
-    def update_expense(self, exp_id, desc, amount, note=""):
-        self.conn.execute("UPDATE expenses SET description=?, amount=?, note=? WHERE id=?",
-                          (desc,amount,note,exp_id))
-        self.conn.commit()
-
-    def delete_expense(self, exp_id):
-        self.conn.execute("DELETE FROM expenses WHERE id=?", (exp_id,))
-        self.conn.commit()
-
-    def get_expenses_by_month(self, user_id, year:int, month:int):
+        return self.conn.execute(_INSERT_EXPENSE_SQL, (user_id,date_str,desc,amount,note)).lastrowid
+
+    def add_expenses_bulk(self, rows):
+        # rows: iterable of (user_id, date, description, amount, note); one statement, one commit
+        self.conn.executemany(_INSERT_EXPENSE_SQL, rows)
+        self.commit()
+
+    def update_expense(self, user_id, exp_id, desc, amount, note="") -> int:
+        # Scoped to the owner like delete_expense; 0 means no such row for this user
+        return self.conn.execute("UPDATE expenses SET description=?, amount=?, note=? WHERE id=? AND user_id=?",
+                          (desc,amount,note,exp_id,user_id)).rowcount
+
+    def delete_expense(self, user_id, exp_id) -> int:
+        # Scoped to the owner in one statement; 0 means no such row for this user
+        return self.conn.execute("DELETE FROM expenses WHERE id=? AND user_id=?", (exp_id, user_id)).rowcount
+
+    # Dates are stored as zero-padded "YYYY-MM-DD HH:MM" text, so a plain range
+    # compare is chronological and can use an index on date (strftime() can't).
+    # Month queries take the [lo, hi) bounds from _month_bounds().
+    def has_expenses_in_month(self, user_id, year:int, month:int) -> bool:
+        row = self.conn.execute("SELECT 1 FROM expenses WHERE user_id=? AND date >= ? AND date < ? LIMIT 1",
+                    (user_id, *_month_bounds(year, month))).fetchone()
+        return row is not None
+
+    def get_expense_by_id(self, user_id, exp_id):
         return self.conn.execute("""SELECT id,date,description,amount,note
-                       FROM expenses
-                       WHERE user_id=? AND strftime('%Y',date)=? AND strftime('%m',date)=?
-                       ORDER BY date ASC""",
-                    (user_id,str(year),f"{month:02d}")).fetchall()
+                       FROM expenses WHERE id=? AND user_id=? LIMIT 1""",
+                    (exp_id, user_id)).fetchone()
 
     def get_total_expenses_by_month(self, user_id, year:int, month:int):
-        row = self.conn.execute("""SELECT SUM(amount) FROM expenses
-                       WHERE user_id=? AND strftime('%Y',date)=? AND strftime('%m',date)=?""",
-                    (user_id,str(year),f"{month:02d}")).fetchone()
-        return row[0] or 0.0
+        # Point lookup on the trigger-maintained month_totals row
+        row = self.conn.execute("SELECT total FROM month_totals WHERE user_id=? AND year=? AND month=?",
+                    (user_id, year, month)).fetchone()
+        return row[0] if row else 0
 
     # incomes
     def add_income(self, user_id, date_str, amount, desc="Income", note=""):
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO incomes(user_id,date,description,amount,note) VALUES(?,?,?,?,?)",
-                    (user_id, date_str, desc, amount, note))
-        self.conn.commit()
-        return cur.lastrowid
-
-    def update_income(self, inc_id, amount, desc="Income", note=""):
-        self.conn.execute("UPDATE incomes SET description=?, amount=?, note=? WHERE id=?",
-                          (desc, amount, note, inc_id))
-        self.conn.commit()
-
-    def delete_income(self, inc_id):
-        self.conn.execute("DELETE FROM incomes WHERE id=?", (inc_id,))
-        self.conn.commit()
-
-    def get_incomes_by_month(self, user_id, year:int, month:int):
+        return self.conn.execute(_INSERT_INCOME_SQL, (user_id, date_str, desc, amount, note)).lastrowid
+
+    def add_incomes_bulk(self, rows):
+        # rows: iterable of (user_id, date, description, amount, note); one statement, one commit
+        self.conn.executemany(_INSERT_INCOME_SQL, rows)
+        self.commit()
+
+    def update_income(self, user_id, inc_id, amount, desc="Income", note="") -> int:
+        return self.conn.execute("UPDATE incomes SET description=?, amount=?, note=? WHERE id=? AND user_id=?",
+                          (desc, amount, note, inc_id, user_id)).rowcount
+
+    def delete_income(self, user_id, inc_id) -> int:
+        return self.conn.execute("DELETE FROM incomes WHERE id=? AND user_id=?", (inc_id, user_id)).rowcount
+
+    def get_income_by_id(self, user_id, inc_id):
         return self.conn.execute("""SELECT id,date,description,amount,note
-                       FROM incomes
-                       WHERE user_id=? AND strftime('%Y',date)=? AND strftime('%m',date)=?
-                       ORDER BY date ASC""",
-                    (user_id, str(year), f"{month:02d}")).fetchall()
+                       FROM incomes WHERE id=? AND user_id=? LIMIT 1""",
+                    (inc_id, user_id)).fetchone()
+
+    def get_month_entries_range(self, user_id, lo:str, hi:str):
+        # Incomes and expenses in display order (per day, incomes before expenses)
+        # with the month's running balance summed by SQLite
+        return self.conn.execute("""SELECT id,date,description,amount,note,kind,
+                              SUM(signed) OVER (ORDER BY substr(date,1,10), kind DESC, date, id
+                                                ROWS UNBOUNDED PRECEDING) AS balance
+                       FROM (SELECT id,date,description,amount,note,'I' AS kind,amount AS signed
+                               FROM incomes WHERE user_id=? AND date >= ? AND date < ?
+                             UNION ALL
+                             SELECT id,date,description,amount,note,'E',-amount
+                               FROM expenses WHERE user_id=? AND date >= ? AND date < ?)
+                       ORDER BY substr(date,1,10), kind DESC, date, id""",
+                    (user_id, lo, hi, user_id, lo, hi))   # cursor: callers stream it
 
     # month summary
     def close_month(self, user_id, year:int, month:int):
-        row = self.conn.execute("""SELECT SUM(amount) FROM expenses
-                       WHERE user_id=? AND strftime('%Y',date)=? AND strftime('%m',date)=?""",
-                    (user_id,str(year),f"{month:02d}")).fetchone()
-        total = row[0] or 0.0
+        # Take the write lock before reading so an expense added meanwhile can't make
+        # the stored total stale; the read and insert commit together
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+        total = self.get_total_expenses_by_month(user_id, year, month)
         self.conn.execute("""INSERT INTO month_summary(user_id,year,month,total) VALUES(?,?,?,?)""",
                     (user_id,year,month,total))
-        self.conn.commit()
+        self.commit()
         return total
 
     def get_month_summary(self, user_id):
@@ -205,11 +405,30 @@ class Database:
                        WHERE user_id=?
                        ORDER BY year DESC, month DESC""", (user_id,)).fetchall()
 
+    def get_month_close_info(self, user_id, year:int, month:int):
+        # created_at of the latest close of that month, or None if it was never closed
+        row = self.conn.execute("""SELECT MAX(created_at) FROM month_summary
+                       WHERE user_id=? AND year=? AND month=?""", (user_id, year, month)).fetchone()
+        return row[0]
+
 # ---------------- Flask app ----------------
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "change-me-secret")
 db = Database()
 
+_requests = itertools.count(1)
+_OPTIMIZE_EVERY = 50
+
+@app.teardown_request
+def _commit_db(exc):
+    # One commit (one fsync) per request instead of one per write
+    if exc is None:
+        db.commit()
+        if next(_requests) % _OPTIMIZE_EVERY == 0:
+            db.optimize()
+    else:
+        db.rollback()
+
 APP_FOOTER = "Developed by: Ko Phyo (NaYaKha), Updated at 28/09/2025, Version 1.1.6/"
 
 # ---------------- Templates (inline) ----------------
@@ -578,6 +797,11 @@ app.jinja_loader = DictLoader({
     "month_detail.html": MONTH_DETAIL_HTML,
     "edit_entry.html": EDIT_HTML,
 })
+# The inline templates never change at runtime: skip per-render reload checks
+# (a local debug run turns them back on) and keep compiled bytecode under the
+# temp dir so warm starts skip parsing.
+app.jinja_env.auto_reload = False
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
 
 # ---------------- Helpers for routes ----------------
 def login_required(fn):
@@ -589,6 +813,11 @@ def login_required(fn):
         return fn(*a, **kw)
     return _wrap
 
+def _form_str(form, name):
+    # Stripped form field, "" when missing or empty
+    v = form.get(name)
+    return v.strip() if v else ""
+
 def get_active_year_month():
     y = session.get("current_year")
     m = session.get("current_month")
@@ -598,78 +827,63 @@ def get_active_year_month():
         session["current_year"], session["current_month"] = y, m
     return int(y), int(m)
 
-def next_month(y, m):
-    return (y, m+1) if m < 12 else (y+1, 1)
-
-def group_month_rows(user_id, year, month):
-    inc = db.get_incomes_by_month(user_id, year, month)
-    exp = db.get_expenses_by_month(user_id, year, month)
+# One display row of a month table; kind is "I" (income), "E" (expense) or "T" (day total / separator)
+Row = namedtuple("Row", "kind key no date time desc income expense balance note highlight")
 
-    def to_dt(row):
-        return datetime.datetime.strptime(row["date"], "%Y-%m-%d %H:%M")
-
-    inc_by_day, exp_by_day, days = defaultdict(list), defaultdict(list), set()
-    for r in inc:
-        dt = to_dt(r); d = dt.date(); days.add(d)
-        inc_by_day[d].append((r["id"], dt, r["description"], float(r["amount"]), r["note"]))
-    for r in exp:
-        dt = to_dt(r); d = dt.date(); days.add(d)
-        exp_by_day[d].append((r["id"], dt, r["description"], float(r["amount"]), r["note"]))
-    for d in inc_by_day: inc_by_day[d].sort(key=lambda x: x[1])
-    for d in exp_by_day: exp_by_day[d].sort(key=lambda x: x[1])
-    all_days = sorted(days)
+def group_month_rows(user_id, year, month, last_key=None):
+    entries = db.get_month_entries_range(user_id, *_month_bounds(year, month))
 
     rows = []
-    running_balance = 0.0
-    last_key = session.get("last_kind_id")  # e.g. "I-5"
-    for d in all_days:
-        per_no = 1
-        balance = running_balance
-        day_exp_total = 0.0
-
-        # incomes
-        for rid, dt, desc, amt, note in inc_by_day.get(d, []):
-            balance += amt
-            key = f"I-{rid}"
-            rows.append(dict(kind="I", key=key,
-                             no=to_myanmar_num(per_no),
-                             date=mmize(dt.strftime("%d-%m-%Y")),
-                             time=mmize(dt.strftime("%H:%M")),
-                             desc=desc or "Income",
-                             income=format_amount_mm(amt),
-                             expense="",
-                             balance=format_amount_mm(balance),
-                             note=note or "",
-                             highlight=(key==last_key)))
-            per_no += 1
-
-        # expenses
-        for rid, dt, desc, amt, note in exp_by_day.get(d, []):
-            balance -= amt
-            day_exp_total += amt
-            key = f"E-{rid}"
-            rows.append(dict(kind="E", key=key,
-                             no=to_myanmar_num(per_no),
-                             date=mmize(dt.strftime("%d-%m-%Y")),
-                             time=mmize(dt.strftime("%H:%M")),
-                             desc=desc,
-                             income="",
-                             expense=format_amount_mm(amt),
-                             balance=format_amount_mm(balance),
-                             note=note or "",
-                             highlight=(key==last_key)))
-            per_no += 1
-
-        if inc_by_day.get(d) or exp_by_day.get(d):
-            desc_total = f"{mmize(date_no_zeroes(d))} ရက်နေ့ စုစုပေါင်းသုံးငွေ ({format_amount_mm(day_exp_total)} ကျပ်)"
-            rows.append(dict(kind="T", key="", no="", date="", time="",
-                             desc=desc_total, income="", expense="", balance="", note="", highlight=False))
-            rows.append(dict(kind="T", key="", no="", date="", time="",
-                             desc="--------", income="", expense="", balance="", note="", highlight=False))
-
-        running_balance = balance
+    # Entries arrive in display order, so each day is one contiguous run.
+    # Dates are fixed "YYYY-MM-DD HH:MM" text: slice instead of parsing.
+    for day, day_entries in itertools.groupby(entries, key=lambda r: r["date"][:10]):
+        day_disp = mmize(f"{day[8:10]}-{day[5:7]}-{day[:4]}")
+        day_exp_total = 0
+        for per_no, r in enumerate(day_entries, 1):
+            kind, amt, balance = r["kind"], r["amount"], r["balance"]
+            key = f"{kind}-{r['id']}"
+            if kind == "I":
+                rows.append(Row(kind="I", key=key,
+                                no=to_myanmar_num(per_no),
+                                date=day_disp,
+                                time=mmize(r["date"][11:16]),
+                                desc=r["description"] or "Income",
+                                income=format_amount_mm(amt),
+                                expense="",
+                                balance=format_amount_mm(balance),
+                                note=r["note"] or "",
+                                highlight=(key==last_key)))
+            else:
+                day_exp_total += amt
+                rows.append(Row(kind="E", key=key,
+                                no=to_myanmar_num(per_no),
+                                date=day_disp,
+                                time=mmize(r["date"][11:16]),
+                                desc=r["description"],
+                                income="",
+                                expense=format_amount_mm(amt),
+                                balance=format_amount_mm(balance),
+                                note=r["note"] or "",
+                                highlight=(key==last_key)))
+
+        d = datetime.date.fromisoformat(day)
+        desc_total = f"{mmize(date_no_zeroes(d))} ရက်နေ့ စုစုပေါင်းသုံးငွေ ({format_amount_mm(day_exp_total)} ကျပ်)"
+        rows.append(Row(kind="T", key="", no="", date="", time="",
+                        desc=desc_total, income="", expense="", balance="", note="", highlight=False))
+        rows.append(Row(kind="T", key="", no="", date="", time="",
+                        desc="--------", income="", expense="", balance="", note="", highlight=False))
     return rows
 
+@functools.lru_cache(maxsize=256)
+def month_view(user_id, year, month, last_key, version):
+    # `version` is db.version, so any committed write makes older entries unreachable
+    rows = group_month_rows(user_id, year, month, last_key)
+    return rows, db.get_total_expenses_by_month(user_id, year, month)
+
+@functools.lru_cache(maxsize=256)
+def month_summary_items(user_id, version):
+    return db.get_month_summary(user_id)
+
 # ---------------- Auth routes ----------------
 @app.get("/login")
 def login():
@@ -679,8 +893,9 @@ def login():
 
 @app.post("/login")
 def do_login():
-    u = request.form.get("username","").strip()
-    p = request.form.get("password","").strip()
+    form = request.form
+    u = _form_str(form, "username")
+    p = _form_str(form, "password")
     uid = db.verify_user(u,p)
     if uid:
         session.clear()
@@ -701,9 +916,10 @@ def signup():
 
 @app.post("/signup")
 def do_signup():
-    u = request.form.get("username","").strip()
-    p = request.form.get("password","").strip()
-    c = request.form.get("confirm","").strip()
+    form = request.form
+    u = _form_str(form, "username")
+    p = _form_str(form, "password")
+    c = _form_str(form, "confirm")
     if not u or not p:
         flash("Username / Password ထည့်ပါ", "error"); return redirect(url_for("signup"))
     if p != c:
@@ -724,8 +940,8 @@ def logout():
 def daily():
     y = session.get("current_year") or datetime.date.today().year
     m = session.get("current_month") or datetime.date.today().month
-    rows = group_month_rows(session["user_id"], y, m)
-    month_total = db.get_total_expenses_by_month(session["user_id"], y, m)
+    # last_kind_id (e.g. "I-5") marks the row to highlight
+    rows, month_total = month_view(session["user_id"], y, m, session.get("last_kind_id"), db.version)
     now = datetime.datetime.now()
     return render_template("daily.html", footer=APP_FOOTER, rows=rows, y=y, m=m,
                            month_total=format_amount_mm(month_total),
@@ -753,18 +969,19 @@ def set_month():
 @app.post("/add-expense")
 @login_required
 def add_expense():
-    date = request.form.get("date")
-    time = request.form.get("time") or "09:00"
-    desc = (request.form.get("desc") or "").strip()
-    amt = en_number_string(request.form.get("amount"))
-    note = (request.form.get("note") or "").strip()
+    form = request.form
+    date = form.get("date")
+    time = form.get("time") or "09:00"
+    desc = _form_str(form, "desc")
+    amt = en_number_string(form.get("amount"))
+    note = _form_str(form, "note")
     if not desc:
         flash("သုံးငွေအကြောင်းအရာ ထည့်ပါ", "error"); return redirect(url_for("daily"))
     try:
-        val = float(amt)
+        val = parse_amount(amt)
         rid = db.add_expense(session["user_id"], f"{date} {time}", desc, val, note)
         session["last_kind_id"] = f"E-{rid}"
-        flash(f"{to_myanmar_num(int(round(val)))} ကျပ် အသစ်ထည့်ပြီးပါပြီ ✔", "ok")
+        flash(f"{to_myanmar_num(val)} ကျပ် အသစ်ထည့်ပြီးပါပြီ ✔", "ok")
     except Exception:
         flash("ပမာဏမှန်မှန်ရေးပါ", "error")
     return redirect(url_for("daily"))
@@ -772,18 +989,19 @@ def add_expense():
 @app.post("/add-income")
 @login_required
 def add_income():
-    date = request.form.get("date")
-    time = request.form.get("time") or "09:00"
-    desc = (request.form.get("desc") or "").strip()
-    amt = en_number_string(request.form.get("amount"))
-    note = (request.form.get("note") or "").strip()
+    form = request.form
+    date = form.get("date")
+    time = form.get("time") or "09:00"
+    desc = _form_str(form, "desc")
+    amt = en_number_string(form.get("amount"))
+    note = _form_str(form, "note")
     if not desc:
         flash("ဝင်ငွေ အတွက် အကြောင်းအရာထည့်ပါ", "error"); return redirect(url_for("daily"))
     try:
-        val = float(amt)
+        val = parse_amount(amt)
         rid = db.add_income(session["user_id"], f"{date} {time}", val, desc=desc, note=note)
         session["last_kind_id"] = f"I-{rid}"
-        flash(f"Income ({desc}) {to_myanmar_num(int(round(val)))} ကျပ် ထည့်ပြီးပါပြီ ✔", "ok")
+        flash(f"Income ({desc}) {to_myanmar_num(val)} ကျပ် ထည့်ပြီးပါပြီ ✔", "ok")
     except Exception:
         flash("ဝင်ငွေ ပမာဏမှန်မှန်ရေးပါ", "error")
     return redirect(url_for("daily"))
@@ -796,9 +1014,10 @@ def delete_entry():
         flash("စုစုပေါင်း / separator row ကို ဖျက်၍ မရပါ", "error"); return redirect(url_for("daily"))
     kind, rid = key.split("-", 1)
     try:
-        if kind == "I": db.delete_income(int(rid))
-        else: db.delete_expense(int(rid))
-        flash("Row ဖျက်ပြီးပါပြီ ✔", "ok")
+        if kind == "I": deleted = db.delete_income(session["user_id"], int(rid))
+        else: deleted = db.delete_expense(session["user_id"], int(rid))
+        if deleted: flash("Row ဖျက်ပြီးပါပြီ ✔", "ok")
+        else: flash("မတွေ့ပါ", "error")
     except Exception:
         flash("ဖျက်မအောင်မြင်ပါ", "error")
     return redirect(url_for("daily"))
@@ -806,14 +1025,10 @@ def delete_entry():
 @app.get("/edit/<kind>/<int:rid>")
 @login_required
 def edit_entry(kind, rid):
-    y, m = get_active_year_month()
-    target = None
     if kind == "I":
-        for r in db.get_incomes_by_month(session["user_id"], y, m):
-            if r["id"] == rid: target = r; break
+        target = db.get_income_by_id(session["user_id"], rid)
     else:
-        for r in db.get_expenses_by_month(session["user_id"], y, m):
-            if r["id"] == rid: target = r; break
+        target = db.get_expense_by_id(session["user_id"], rid)
     if not target:
         flash("မတွေ့ပါ", "error"); return redirect(url_for("daily"))
     return render_template("edit_entry.html", footer=APP_FOOTER, kind=kind, r=target)
@@ -821,23 +1036,26 @@ def edit_entry(kind, rid):
 @app.post("/edit/<kind>/<int:rid>")
 @login_required
 def save_edit(kind, rid):
-    desc = (request.form.get("desc") or "").strip()
-    amt  = en_number_string(request.form.get("amount"))
-    note = (request.form.get("note") or "").strip()
+    form = request.form
+    desc = _form_str(form, "desc")
+    amt  = en_number_string(form.get("amount"))
+    note = _form_str(form, "note")
     try:
-        val = float(amt)
+        val = parse_amount(amt)
         if kind == "I":
             if not desc: desc = "Income"
-            db.update_income(rid, val, desc=desc, note=note)
+            if not db.update_income(session["user_id"], rid, val, desc=desc, note=note):
+                flash("မတွေ့ပါ", "error"); return redirect(url_for("daily"))
             session["last_kind_id"] = f"I-{rid}"
-            flash(f"Income ကို ({desc}) {to_myanmar_num(int(round(val)))} ကျပ် ပြင်ပြီးပါပြီ ✔", "ok")
+            flash(f"Income ကို ({desc}) {to_myanmar_num(val)} ကျပ် ပြင်ပြီးပါပြီ ✔", "ok")
         else:
             if not desc:
                 flash("အသုံးအကြောင်းအရာ မလွတ်ခွင့်", "error")
                 return redirect(url_for("edit_entry", kind=kind, rid=rid))
-            db.update_expense(rid, desc, val, note=note)
+            if not db.update_expense(session["user_id"], rid, desc, val, note=note):
+                flash("မတွေ့ပါ", "error"); return redirect(url_for("daily"))
             session["last_kind_id"] = f"E-{rid}"
-            flash(f"{to_myanmar_num(int(round(val)))} ကျပ် ပြင်ပြီးပါပြီ ✔", "ok")
+            flash(f"{to_myanmar_num(val)} ကျပ် ပြင်ပြီးပါပြီ ✔", "ok")
     except Exception:
         flash("ပမာဏမှန်မှန်ရေးပါ", "error")
         return redirect(url_for("edit_entry", kind=kind, rid=rid))
@@ -847,91 +1065,98 @@ def save_edit(kind, rid):
 @login_required
 def close_month():
     y, m = get_active_year_month()
-    rows_this_month = db.get_expenses_by_month(session["user_id"], y, m)
-    if not rows_this_month:
+    if not db.has_expenses_in_month(session["user_id"], y, m):
         flash("ယခု လအတွက် expense entry မရှိသေးပါ။", "error"); return redirect(url_for("daily"))
     total = db.close_month(session["user_id"], y, m)
     flash(f"{to_myanmar_num(m)}/{to_myanmar_num(y)} လ စုစုပေါင်း (သုံးငွေ): {format_amount_mm(total)} ကျပ် ✔", "ok")
     ny, nm = next_month(y, m)
-    session["current_year"], session["current_month"] = ny, nm
-    session.pop("last_kind_id", None)
+    session.update({"current_year": ny, "current_month": nm})
+    if "last_kind_id" in session:
+        del session["last_kind_id"]
     return redirect(url_for("daily"))
 
 @app.get("/summary")
 @login_required
 def summary():
-    items = db.get_month_summary(session["user_id"])
+    items = month_summary_items(session["user_id"], db.version)
     return render_template("summary.html", footer=APP_FOOTER, items=items,
                            format_amount_mm=format_amount_mm, to_myanmar_num=to_myanmar_num)
 
 @app.get("/month/<int:year>/<int:month>")
 @login_required
 def month_detail(year, month):
-    rows = group_month_rows(session["user_id"], year, month)
+    rows, _ = month_view(session["user_id"], year, month, None, db.version)
     return render_template("month_detail.html", footer=APP_FOOTER, rows=rows, y=year, m=month)
 
 # ---------------- Export ----------------
+# db.version restarts at 0 with the process, so salt ETags per process
+_ETAG_SALT = os.urandom(8).hex()
+
+def export_etag(user_id, y, m, fmt):
+    # Only closed months get an ETag. They can still be edited afterwards, so the
+    # tag also covers db.version and changes with any later write.
+    closed_at = db.get_month_close_info(user_id, y, m)
+    if not closed_at:
+        return None
+    return hashlib.md5(f"{user_id}-{y}-{m}-{closed_at}-{db.version}-{_ETAG_SALT}-{fmt}".encode()).hexdigest()
+
+def with_export_caching(resp, etag):
+    if etag:
+        # Browser revalidates with If-None-Match and gets a 304 while nothing changed
+        resp.set_etag(etag)
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+    else:
+        resp.cache_control.no_store = True
+    return resp
+
 @app.get("/export/txt")
 @login_required
 def export_txt():
     y = int(request.args.get("year"))
     m = int(request.args.get("month"))
-    rows = group_month_rows(session["user_id"], y, m)
-    buf = io.StringIO()
-    buf.write("စဉ်\tရက်စွဲ\tအချိန်\tအကြောင်းအရာ\tဝင်ငွေ\tသုံးငွေ\tလက်ကျန်ငွေ\tမှတ်ချက်\n")
-    for r in rows:
-        if r["kind"] == "T":
-            buf.write(f"\t\t\t{r['desc']}\t\t\t\t\n")
-        else:
-            buf.write(f"{r['no']}\t{r['date']}\t{r['time']}\t{r['desc']}\t{r['income']}\t{r['expense']}\t{r['balance']}\t{r['note']}\n")
-    data = buf.getvalue().encode("utf-8"); buf.close()
-    return send_file(io.BytesIO(data), mimetype="text/plain; charset=utf-8",
-                     as_attachment=True, download_name=f"summary_{y}_{m:02d}.txt")
-
-@app.get("/export/pdf")
-@login_required
-def export_pdf():
-    try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_LEFT
-    except ImportError:
-        flash("PDF ထုတ်/export လုပ်ရန် 'reportlab' library လိုအပ်ပါတယ် (pip install reportlab)", "error")
-        return redirect(url_for("summary"))
-
-    y = int(request.args.get("year"))
-    m = int(request.args.get("month"))
-    rows = group_month_rows(session["user_id"], y, m)
-    font_name = "Helvetica"
+    etag = export_etag(session["user_id"], y, m, "txt")
+    if etag and etag in request.if_none_match:
+        return with_export_caching(Response(status=304), etag)
+    rows, _ = month_view(session["user_id"], y, m, None, db.version)
+
+    def line(r):
+        if r.kind == "T":
+            return f"\t\t\t{r.desc}\t\t\t\t\n"
+        return f"{r.no}\t{r.date}\t{r.time}\t{r.desc}\t{r.income}\t{r.expense}\t{r.balance}\t{r.note}\n"
+
+    def generate():
+        # Stream encoded chunks of 64 rows instead of building the whole file in memory
+        yield "စဉ်\tရက်စွဲ\tအချိန်\tအကြောင်းအရာ\tဝင်ငွေ\tသုံးငွေ\tလက်ကျန်ငွေ\tမှတ်ချက်\n".encode("utf-8")
+        for i in range(0, len(rows), 64):
+            yield "".join(line(r) for r in rows[i:i+64]).encode("utf-8")
+
+    resp = Response(generate(), mimetype="text/plain",   # Werkzeug adds charset=utf-8
+                    headers={"Content-Disposition": f'attachment; filename="summary_{y}_{m:02d}.txt"'})
+    return with_export_caching(resp, etag)
+
+# PDF font and styles only depend on the machine, so build them once per process
+# (on first export, not at import, to keep cold starts free of the font search)
+@functools.lru_cache(maxsize=1)
+def _pdf_font():
     font_path = find_myanmar_ttf()
     if font_path:
         try:
-            pdfmetrics.registerFont(TTFont("MMFont", font_path)); font_name = "MMFont"
+            pdfmetrics.registerFont(TTFont("MMFont", font_path))
+            return "MMFont"
         except Exception:
             pass
+    return "Helvetica"
 
-    data = [["စဉ်","ရက်စွဲ","အချိန်","အကြောင်းအရာ","ဝင်ငွေ","သုံးငွေ","လက်ကျန်ငွေ","မှတ်ချက်"]]
-    for r in rows:
-        if r["kind"] == "T":
-            data.append(["", "", "", r["desc"], "", "", "", ""])
-        else:
-            data.append([r["no"], r["date"], r["time"], r["desc"], r["income"], r["expense"], r["balance"], r["note"]])
+@functools.lru_cache(maxsize=1)
+def _pdf_title_style():
+    return ParagraphStyle("mm-title", parent=getSampleStyleSheet()["Heading2"], fontName=_pdf_font(),
+                          alignment=TA_LEFT, leading=16)
 
-    pdf = io.BytesIO()
-    doc = SimpleDocTemplate(pdf, pagesize=landscape(A4), leftMargin=18, rightMargin=18, topMargin=18, bottomMargin=18)
-    elements = []
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle("mm-title", parent=styles["Heading2"], fontName=font_name, alignment=TA_LEFT, leading=16)
-    elements.append(Paragraph(f"{to_myanmar_num(m)}/{to_myanmar_num(y)}အတွက်ဝင်ငွေ/သုံးငွေစာရင်းချုပ်", title_style))
-    elements.append(Spacer(1, 8))
-    col_widths = [35, 80, 60, 320, 95, 95, 110, 160]
-    tbl = Table(data, repeatRows=1, colWidths=col_widths)
-    ts = TableStyle([
-        ('FONT', (0,0), (-1,-1), font_name),
+@functools.lru_cache(maxsize=1)
+def _pdf_table_style():
+    return TableStyle([
+        ('FONT', (0,0), (-1,-1), _pdf_font()),
         ('FONTSIZE', (0,0), (-1,-1), 9),
         ('ALIGN', (0,0), (2,0), 'CENTER'),
         ('ALIGN', (3,0), (3,0), 'CENTER'),
@@ -947,10 +1172,93 @@ def export_pdf():
         ('INNERGRID', (0,0), (-1,-1), 0.25, colors.HexColor('#d1d5db')),
         ('BOX', (0,0), (-1,-1), 0.5, colors.HexColor('#9ca3af')),
     ])
-    tbl.setStyle(ts); elements.append(tbl); doc.build(elements)
-    pdf.seek(0)
-    return send_file(pdf, mimetype="application/pdf", as_attachment=True,
+
+_PDF_HEADER = ["စဉ်","ရက်စွဲ","အချိန်","အကြောင်းအရာ","ဝင်ငွေ","သုံးငွေ","လက်ကျန်ငွေ","မှတ်ချက်"]
+_COL_WIDTHS = [35, 80, 60, 320, 95, 95, 110, 160]
+_PDF_CHUNK_ROWS = 100
+
+def _build_pdf_bytes(rows, y, m):
+    # Module-level so a pool worker can run it; rows are picklable Row tuples
+    body = [["", "", "", r.desc, "", "", "", ""] if r.kind == "T" else
+            [r.no, r.date, r.time, r.desc, r.income, r.expense, r.balance, r.note]
+            for r in rows]
+
+    pdf = io.BytesIO()
+    doc = SimpleDocTemplate(pdf, pagesize=landscape(A4), leftMargin=18, rightMargin=18, topMargin=18, bottomMargin=18)
+    elements = []
+    elements.append(Paragraph(f"{to_myanmar_num(m)}/{to_myanmar_num(y)}အတွက်ဝင်ငွေ/သုံးငွေစာရင်းချုပ်", _pdf_title_style()))
+    elements.append(Spacer(1, 8))
+    # One Table per chunk: reportlab re-splits a single huge table on every page break,
+    # which grows super-linearly with the row count
+    for i in range(0, max(len(body), 1), _PDF_CHUNK_ROWS):
+        tbl = Table([_PDF_HEADER] + body[i:i+_PDF_CHUNK_ROWS], repeatRows=1, colWidths=_COL_WIDTHS)
+        tbl.setStyle(_pdf_table_style()); elements.append(tbl)
+    doc.build(elements)
+    return pdf.getvalue()
+
+# reportlab is CPU-bound pure Python; building in worker processes keeps it off the
+# GIL that request threads share. Vercel functions lack the /dev/shm multiprocessing
+# needs, so PDFs are built in-process there.
+_pdf_pool_lock = threading.Lock()
+_pdf_executor = None
+_pdf_pool_unavailable = bool(os.environ.get("VERCEL"))
+
+def _pdf_pool():
+    # Created once under the lock, so concurrent first exports can't each fork a pool
+    global _pdf_executor, _pdf_pool_unavailable
+    with _pdf_pool_lock:
+        if _pdf_executor is None and not _pdf_pool_unavailable:
+            try:
+                _pdf_executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+            except OSError:
+                _pdf_pool_unavailable = True    # no semaphore support (e.g. missing /dev/shm); not retried
+        return _pdf_executor
+
+def _drop_pdf_pool(pool):
+    # Shut a broken pool down; the next export starts a fresh one
+    global _pdf_executor
+    with _pdf_pool_lock:
+        if _pdf_executor is pool:
+            _pdf_executor = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+@app.get("/export/pdf")
+@login_required
+def export_pdf():
+    if not REPORTLAB_AVAILABLE:
+        flash("PDF ထုတ်/export လုပ်ရန် 'reportlab' library လိုအပ်ပါတယ် (pip install reportlab)", "error")
+        return redirect(url_for("summary"))
+
+    y = int(request.args.get("year"))
+    m = int(request.args.get("month"))
+    etag = export_etag(session["user_id"], y, m, "pdf")
+    if etag and etag in request.if_none_match:
+        return with_export_caching(Response(status=304), etag)
+    rows, _ = month_view(session["user_id"], y, m, None, db.version)
+
+    pdf_bytes = None
+    pool = _pdf_pool()
+    if pool is not None:
+        try:
+            future = pool.submit(_build_pdf_bytes, rows, y, m)
+        except (BrokenProcessPool, OSError):
+            future = None   # worker processes unavailable; build in this process instead
+            _drop_pdf_pool(pool)
+        if future is not None:
+            try:
+                pdf_bytes = future.result(timeout=60)
+            except TimeoutError:
+                # Rebuilding in this process would only double the wait
+                future.cancel()
+                flash("PDF ထုတ်ရာတွင် အချိန်ကြာလွန်းနေပါတယ်၊ ထပ်မံကြိုးစားပါ", "error")
+                return redirect(url_for("summary"))
+            except BrokenProcessPool:
+                _drop_pdf_pool(pool)    # a worker died; build in this process instead
+    if pdf_bytes is None:
+        pdf_bytes = _build_pdf_bytes(rows, y, m)
+    resp = send_file(io.BytesIO(pdf_bytes), mimetype="application/pdf", as_attachment=True,
                      download_name=f"summary_{y}_{m:02d}.pdf")
+    return with_export_caching(resp, etag)
 
 # ---------------- Local run (not used on Vercel) ----------------
 if __name__ == "__main__":